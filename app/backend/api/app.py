@@ -1,12 +1,14 @@
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, request, jsonify, send_from_directory, Response, abort
 from flask_cors import CORS
 import requests
 import re
 import json
 from datetime import datetime
 import joblib
+import mimetypes
 import numpy as np
 import os
+import posixpath
 import pandas as pd
 
 # Load the Part 1 models
@@ -20,6 +22,10 @@ LLM_MODEL = "llama3.1"
 TEMPERATURE_RANGE = (-5, 40)  # Typical range for ocean temperatures in °C
 DHW_RANGE = (0, 20)  # Typical range for Degree Heating Weeks
 REQUIRED_FIELDS = ['region', 'date', 'min_sst', 'max_sst', 'hotspot_sst', 'sst_anomaly', 'dhw_90th']
+OBSERVATION_FIELDS = ['min_sst', 'max_sst', 'hotspot_sst', 'sst_anomaly', 'dhw_90th']
+MAX_FORECAST_DAYS = 90
+MAX_FORECAST_STATIONS = 100
+FORECAST_CHUNK_STATIONS = 10  # Stations scored per model call when streaming
 
 # Region-specific information
 REGION_INFO = {
@@ -41,9 +47,65 @@ REGION_INFO = {
     }
 }
 
-app = Flask(__name__, static_folder='../../frontend', static_url_path='')
+# Season one-hot encoding used by the Part 1 model
+SEASONS = {
+    'Fall': [9, 10, 11],
+    'Spring': [3, 4, 5],
+    'Summer': [6, 7, 8],
+    'Winter': [12, 1, 2]
+}
+
+# Lag columns built from a station's daily series: name -> (source field, pandas shift in days).
+# Matches the training notebook: the *_lag_back_N features are the value N days later
+# (shift(-N)) and DHW_from_90th_HS>1_lag_forward_29 is the value 29 days earlier (shift(29)).
+LAG_FEATURES = {
+    'min_sst_lead_4': ('min_sst', -4),
+    'max_sst_lead_4': ('max_sst', -4),
+    'hotspot_sst_lead_4': ('hotspot_sst', -4),
+    'sst_anomaly_lead_3': ('sst_anomaly', -3),
+    'dhw_90th_lag_29': ('dhw_90th', 29)
+}
+# Days of history / projections beyond the forecast window that can feed a lag feature
+MAX_HISTORY_DAYS = max(shift for _, shift in LAG_FEATURES.values())
+MAX_LEAD_DAYS = -min(shift for _, shift in LAG_FEATURES.values())
+
+# Frontend files are served by serve_frontend/serve_static rather than Flask's static route
+FRONTEND_DIR = os.path.join(os.path.dirname(__file__), '../../frontend')
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
+# Fingerprinted, precompressed frontend assets produced by build_assets.py
+DIST_DIR = os.path.join(FRONTEND_DIR, 'dist')
+ASSET_MAX_AGE = 31536000  # One year, hashed file names never change content
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Parsed manifest, reloaded whenever build_assets.py replaces the file
+asset_manifest = {'mtime': None, 'index': None, 'assets': {}}
+
+
+def load_asset_manifest():
+    """Return the index asset and hashed assets (keyed by the path the browser requests)"""
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime != asset_manifest['mtime']:
+        index, assets = None, {}
+        if mtime is not None:
+            with open(MANIFEST_PATH) as file:
+                manifest = json.load(file)
+            index = manifest['index']
+            # Hashed files from earlier builds stay servable for pages that still reference them
+            built = list(manifest['assets'].values()) + manifest.get('previous', [])
+            assets = {asset['path']: asset for asset in built}
+        asset_manifest.update(mtime=mtime, index=index, assets=assets)
+
+    return asset_manifest['index'], asset_manifest['assets']
+
 # Mapping BAA levels to risk information
 RISK_LEVELS = {
     0: {
@@ -89,20 +151,9 @@ def validate_temperature_data(data):
         # Validate date format
         datetime.strptime(data['date'], '%Y-%m-%d')
         
-        # Validate temperature values
-        for field in ['min_sst', 'max_sst', 'hotspot_sst', 'sst_anomaly']:
-            data[field] = float(data[field])
-            if not TEMPERATURE_RANGE[0] <= data[field] <= TEMPERATURE_RANGE[1]:
-                return {
-                    'error': f'Invalid value for {field}. Must be between {TEMPERATURE_RANGE[0]}°C and {TEMPERATURE_RANGE[1]}°C'
-                }, 400
-        
-        # Validate DHW
-        data['dhw_90th'] = float(data['dhw_90th'])
-        if not DHW_RANGE[0] <= data['dhw_90th'] <= DHW_RANGE[1]:
-            return {
-                'error': f'Invalid value for DHW. Must be between {DHW_RANGE[0]} and {DHW_RANGE[1]}'
-            }, 400
+        validation_error = validate_observation_values(data)
+        if validation_error:
+            return validation_error
 
     except ValueError as e:
         return {
@@ -111,6 +162,103 @@ def validate_temperature_data(data):
 
     return None
 
+def validate_observation_values(observation):
+    """Validate the SST and DHW values of one observation, converting them to float"""
+    # Validate temperature values
+    for field in ['min_sst', 'max_sst', 'hotspot_sst', 'sst_anomaly']:
+        observation[field] = float(observation[field])
+        if not TEMPERATURE_RANGE[0] <= observation[field] <= TEMPERATURE_RANGE[1]:
+            return {
+                'error': f'Invalid value for {field}. Must be between {TEMPERATURE_RANGE[0]}°C and {TEMPERATURE_RANGE[1]}°C'
+            }, 400
+    
+    # Validate DHW
+    observation['dhw_90th'] = float(observation['dhw_90th'])
+    if not DHW_RANGE[0] <= observation['dhw_90th'] <= DHW_RANGE[1]:
+        return {
+            'error': f'Invalid value for DHW. Must be between {DHW_RANGE[0]} and {DHW_RANGE[1]}'
+        }, 400
+
+    return None
+
+def validate_forecast_data(data):
+    """Validate forecast input: stations with a start date, daily projections and optional history"""
+    if not request.is_json:
+        return {'error': 'Content-Type must be application/json'}, 400
+
+    if not isinstance(data, dict):
+        return {'error': 'Request body must be a JSON object'}, 400
+
+    stations = data.get('stations')
+    if not isinstance(stations, list) or not stations:
+        return {'error': 'stations must be a non-empty list'}, 400
+    if len(stations) > MAX_FORECAST_STATIONS:
+        return {'error': f'At most {MAX_FORECAST_STATIONS} stations per request'}, 400
+
+    days = data.get('days')
+    if days is not None and (not isinstance(days, int) or isinstance(days, bool) or not 1 <= days <= MAX_FORECAST_DAYS):
+        return {'error': f'days must be an integer between 1 and {MAX_FORECAST_DAYS}'}, 400
+
+    if not isinstance(data.get('stream', True), bool):
+        return {'error': 'stream must be a boolean'}, 400
+
+    for index, station in enumerate(stations):
+        if not isinstance(station, dict) or not all(field in station for field in ['region', 'start_date', 'projections']):
+            return {
+                'error': 'Missing required fields',
+                'required_fields': ['region', 'start_date', 'projections'],
+                'station': index
+            }, 400
+
+        station_id = station.get('station', index)
+        if isinstance(station_id, bool) or not isinstance(station_id, (str, int, float)):
+            return {'error': 'station must be a string or number', 'station': index}, 400
+
+        if not isinstance(station['region'], str) or station['region'] not in REGION_INFO:
+            return {
+                'error': 'Invalid region',
+                'valid_regions': list(REGION_INFO.keys()),
+                'station': index
+            }, 400
+
+        if not isinstance(station['start_date'], str):
+            return {'error': 'start_date must be a YYYY-MM-DD string', 'station': index}, 400
+
+        projections = station['projections']
+        history = station.get('history', [])
+        if not isinstance(projections, list) or not projections or not isinstance(history, list):
+            return {'error': 'projections must be a non-empty list and history a list', 'station': index}, 400
+        if days is not None and len(projections) < days:
+            return {'error': f'Expected at least {days} projections, got {len(projections)}', 'station': index}, 400
+        if len(projections) > MAX_FORECAST_DAYS + MAX_LEAD_DAYS:
+            return {'error': f'At most {MAX_FORECAST_DAYS + MAX_LEAD_DAYS} projections per station', 'station': index}, 400
+        if len(history) > MAX_HISTORY_DAYS:
+            return {'error': f'At most {MAX_HISTORY_DAYS} days of history per station', 'station': index}, 400
+
+        try:
+            datetime.strptime(station['start_date'], '%Y-%m-%d')
+
+            for observation in history + projections:
+                if not isinstance(observation, dict) or not all(field in observation for field in OBSERVATION_FIELDS):
+                    return {
+                        'error': 'Missing required observation fields',
+                        'required_fields': OBSERVATION_FIELDS,
+                        'station': index
+                    }, 400
+
+                validation_error = validate_observation_values(observation)
+                if validation_error:
+                    validation_error[0]['station'] = index
+                    return validation_error
+
+        except (TypeError, ValueError) as e:
+            return {
+                'error': f'Invalid value format: {str(e)}',
+                'station': index
+            }, 400
+
+    return None
+
 def get_llama_prediction(data):
     """Get prediction from the model"""
     try:
@@ -198,99 +346,80 @@ def extract_baa_level(llama_response):
 
     return baa_level, None, None
 
+def build_part1_features(rows):
+    """Build the Part 1 model features for a DataFrame of daily observations
+
+    rows needs a datetime 'date' column, 'region' and the SST/DHW fields. Lag
+    columns from LAG_FEATURES are used when present, otherwise the current
+    values stand in for them.
+    """
+    def lagged(column):
+        source = LAG_FEATURES[column][0]
+        return rows[column] if column in rows else rows[source]
+
+    month = rows['date'].dt.month
+    season = month.map({m: s for s, months in SEASONS.items() for m in months})
+
+    # Columns in exact order as model.feature_names_in_
+    features = pd.DataFrame({
+        'YYYY': rows['date'].dt.year,
+        'MM': month,
+        'DD': rows['date'].dt.day,
+        'SST_MIN': rows['min_sst'],
+        'SST_MAX': rows['max_sst'],
+        'SST@90th_HS': rows['hotspot_sst'],
+        'SSTA@90th_HS': rows['sst_anomaly'],
+        '90th_HS>0': rows['hotspot_sst'],
+        'DHW_from_90th_HS>1': rows['dhw_90th'],
+        'SST_MIN_lag_back_4': lagged('min_sst_lead_4'),
+        'SST_MAX_lag_back_4': lagged('max_sst_lead_4'),
+        'SST@90th_HS_lag_back_4': lagged('hotspot_sst_lead_4'),
+        'SSTA@90th_HS_lag_back_3': lagged('sst_anomaly_lead_3'),
+        '90th_HS>0_lag_back_4': lagged('hotspot_sst_lead_4'),
+        'DHW_from_90th_HS>1_lag_forward_29': lagged('dhw_90th_lag_29'),
+        'SSTA_above_threshold': (rows['sst_anomaly'] > 0).astype(int),
+        '90th_HS_above_0': (rows['hotspot_sst'] > 0).astype(int),
+        'SSTA_squared': rows['sst_anomaly'] ** 2,
+        'SSTA_DHW_interaction': rows['sst_anomaly'] * rows['dhw_90th']
+    })
+    for s in SEASONS:
+        features[f'Season_{s}'] = (season == s).astype(int)
+    for r in REGION_INFO:
+        features[f'Region_{r}'] = (rows['region'] == r).astype(int)
+
+    return features
+
 def get_part1_prediction(data):
     """Get prediction from the Part 1 model"""
     try:
         print("\n=== Starting prediction process ===")
         print("1. Raw input data:", json.dumps(data, indent=2))
         
-        # Extract date components
-        date_obj = datetime.strptime(data['date'], '%Y-%m-%d')
-        year = date_obj.year
-        month = date_obj.month
-        day = date_obj.day
-        
-        # Determine season
-        seasons = {
-            'Fall': [9, 10, 11],
-            'Spring': [3, 4, 5],
-            'Summer': [6, 7, 8],
-            'Winter': [12, 1, 2]
-        }
-        current_season = next(season for season, months in seasons.items() if month in months)
-        season_features = {f'Season_{s}': 1 if s == current_season else 0 for s in seasons.keys()}
-        
-        print("\n2. Date components:")
-        print(f"Year: {year}, Month: {month}, Day: {day}, Season: {current_season}")
-        
-        # Create region encoding (one-hot)
-        regions = ['Caribbean', 'Great Barrier Reef', 'Polynesia', 'South Asia']
-        region_features = {f'Region_{r}': 1 if r == data['region'] else 0 for r in regions}
-        print("\n3. Region encoding:")
-        print(json.dumps(region_features, indent=2))
-        
-        # Calculate derived features
-        ssta_dhw_interaction = data['sst_anomaly'] * data['dhw_90th']
-        ssta_squared = data['sst_anomaly'] ** 2
-        ssta_above_threshold = 1 if data['sst_anomaly'] > 0 else 0
+        # One-row frame without lag columns, the builder falls back to the current values
+        observation = pd.DataFrame([data])
+        observation['date'] = pd.to_datetime(observation['date'], format='%Y-%m-%d')
+        features = build_part1_features(observation)
         
-        print("\n4. Calculated features:")
-        print(f"SSTA_DHW_interaction: {ssta_dhw_interaction}")
-        print(f"SSTA_squared: {ssta_squared}")
-        print(f"SSTA_above_threshold: {ssta_above_threshold}")
-        
-        # Create features in exact order as model expects
-        features = pd.DataFrame([{
-            # Exact order from model.feature_names_in_
-            'YYYY': year,
-            'MM': month,
-            'DD': day,
-            'SST_MIN': data['min_sst'],
-            'SST_MAX': data['max_sst'],
-            'SST@90th_HS': data['hotspot_sst'],
-            'SSTA@90th_HS': data['sst_anomaly'],
-            '90th_HS>0': data['hotspot_sst'],
-            'DHW_from_90th_HS>1': data['dhw_90th'],
-            'SST_MIN_lag_back_4': data['min_sst'],
-            'SST_MAX_lag_back_4': data['max_sst'],
-            'SST@90th_HS_lag_back_4': data['hotspot_sst'],
-            'SSTA@90th_HS_lag_back_3': data['sst_anomaly'],
-            '90th_HS>0_lag_back_4': data['hotspot_sst'],
-            'DHW_from_90th_HS>1_lag_forward_29': data['dhw_90th'],
-            'SSTA_above_threshold': ssta_above_threshold,
-            '90th_HS_above_0': 1 if data['hotspot_sst'] > 0 else 0,
-            'SSTA_squared': ssta_squared,
-            'SSTA_DHW_interaction': ssta_dhw_interaction,
-            'Season_Fall': season_features['Season_Fall'],
-            'Season_Spring': season_features['Season_Spring'],
-            'Season_Summer': season_features['Season_Summer'],
-            'Season_Winter': season_features['Season_Winter'],
-            'Region_Caribbean': region_features['Region_Caribbean'],
-            'Region_Great Barrier Reef': region_features['Region_Great Barrier Reef'],
-            'Region_Polynesia': region_features['Region_Polynesia'],
-            'Region_South Asia': region_features['Region_South Asia']
-        }])
-        
-        print("\n5. Features DataFrame:")
+        print("\n2. Features DataFrame:")
         print(features.to_string())
         print("\nFeature names in order:", list(features.columns))
         
-        print("\n6. Model's expected feature names:")
+        print("\n3. Model's expected feature names:")
         print(coral_model.feature_names_in_ if hasattr(coral_model, 'feature_names_in_') else "Feature names not available in model")
         
         # Scale the features
         scaled_features = scaler.transform(features)
-        print("\n7. Scaled features shape:", scaled_features.shape)
+        print("\n4. Scaled features shape:", scaled_features.shape)
         print("Scaled features:")
         print(scaled_features)
         
         # Get prediction
         prediction = coral_model.predict(scaled_features)[0]
-        print("\n8. Raw model prediction:", prediction)
+        print("\n5. Raw model prediction:", prediction)
         
         # Ensure prediction is in valid range
         prediction = max(0, min(4, int(round(prediction))))
-        print("9. Final adjusted prediction:", prediction)
+        print("6. Final adjusted prediction:", prediction)
         print("\n=== Prediction process completed ===\n")
         
         return prediction, None, None
@@ -307,14 +436,109 @@ def get_part1_prediction(data):
             'error': f'Error using Part 1 model: {str(e)}\nTraceback: {traceback.format_exc()}'
         }, 500
 
+def get_part1_forecast(stations, days, first_index=0):
+    """Score every (station, horizon) row of the given stations with a single Part 1 model call
+
+    first_index is the position of stations[0] in the request, used as the default station id.
+    """
+    try:
+        series = []
+        for index, station in enumerate(stations, start=first_index):
+            history = station.get('history', [])
+            frame = pd.DataFrame(history + station['projections'], columns=OBSERVATION_FIELDS)
+            # History holds the days right before start_date, projections start on it
+            offsets = np.arange(len(frame)) - len(history)
+            frame['date'] = pd.Timestamp(station['start_date']) + pd.to_timedelta(offsets, unit='D')
+            frame['horizon'] = offsets + 1
+            frame['station_index'] = index
+            frame['station'] = station.get('station', index)
+            frame['region'] = station['region']
+            series.append(frame)
+        rows = pd.concat(series, ignore_index=True)
+
+        # Lags come from each station's own series: lag_back features from later projections,
+        # the DHW lag from history. Where the series is too short, fall back to the current
+        # value the same way a single /predict call does
+        grouped = rows.groupby('station_index')
+        for column, (source, shift) in LAG_FEATURES.items():
+            rows[column] = grouped[source].shift(shift).fillna(rows[source])
+
+        # Projections past the window only feed the lag_back features
+        days = days or MAX_FORECAST_DAYS
+        rows = rows[(rows['horizon'] > 0) & (rows['horizon'] <= days)].reset_index(drop=True)
+
+        features = build_part1_features(rows)
+        predictions = coral_model.predict(scaler.transform(features))
+
+        # Ensure predictions are in valid range
+        rows['risk_level'] = np.clip(np.rint(predictions), 0, 4).astype(int)
+        return rows, None, None
+
+    except Exception as e:
+        app.logger.error(f'Unexpected error in forecast: {str(e)}')
+        return None, {
+            'error': f'Error using Part 1 model: {str(e)}'
+        }, 500
+
+def forecast_records(rows):
+    """Yield one forecast record per (station, horizon) row"""
+    dates = rows['date'].dt.strftime('%Y-%m-%d')
+    for row, date in zip(rows.itertuples(index=False), dates):
+        yield {
+            'station': row.station,
+            'region': row.region,
+            'date': date,
+            'horizon': int(row.horizon),
+            'risk_level': int(row.risk_level),
+            'status': RISK_LEVELS[row.risk_level]['status']
+        }
+
+def send_built_asset(asset, immutable):
+    """Send a built asset, picking the best precompressed variant the client accepts"""
+    # Highest q-value wins, ties go to the manifest order (brotli first); None means identity
+    encoding = request.accept_encodings.best_match(asset['encodings'])
+    filename = asset['path'] + ENCODING_SUFFIXES.get(encoding, '')
+    mimetype = mimetypes.guess_type(asset['path'])[0]
+
+    response = send_from_directory(
+        DIST_DIR,
+        filename,
+        mimetype=mimetype,
+        etag=f"{asset['hash']}-{encoding or 'identity'}",
+        max_age=ASSET_MAX_AGE if immutable else 0
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        # Always revalidate index.html so new asset hashes are picked up
+        response.cache_control.no_cache = True
+    return response
+
 @app.route('/')
 def serve_frontend():
-    return send_from_directory(app.static_folder, 'index.html')
+    index_asset, _ = load_asset_manifest()
+    if index_asset:
+        return send_built_asset(index_asset, immutable=False)
+    return send_from_directory(FRONTEND_DIR, 'index.html')
 
 # Serve static files (CSS, JS, images)
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory(app.static_folder, path)
+    index_asset, hashed_assets = load_asset_manifest()
+    if path in hashed_assets:
+        return send_built_asset(hashed_assets[path], immutable=True)
+
+    # Normalize first so dot segments can't reach dist/ (casefold for case-insensitive filesystems)
+    normalized = posixpath.normpath(path).casefold()
+    if index_asset and normalized == 'index.html':
+        return send_built_asset(index_asset, immutable=False)
+    # Built files are only reachable through their hashed names
+    if normalized == 'dist' or normalized.startswith('dist/'):
+        abort(404)
+    return send_from_directory(FRONTEND_DIR, path)
 
 @app.route('/predict', methods=['POST'])
 def predict_bleaching():
@@ -356,6 +580,41 @@ def predict_bleaching():
         'description': risk_info['description']
     })
 
+@app.route('/forecast', methods=['POST'])
+def forecast_bleaching():
+    """Forecast coral bleaching risk for one or more stations over the next days"""
+    data = request.json
+
+    # Validate input data
+    validation_error = validate_forecast_data(data)
+    if validation_error:
+        return jsonify(validation_error[0]), validation_error[1]
+
+    stations = data['stations']
+    days = data.get('days')
+
+    # Stream NDJSON by default, scoring FORECAST_CHUNK_STATIONS stations per model call
+    # so clients can render the first stations while the rest are still being scored
+    if data.get('stream', True):
+        def generate():
+            for first_index in range(0, len(stations), FORECAST_CHUNK_STATIONS):
+                chunk = stations[first_index:first_index + FORECAST_CHUNK_STATIONS]
+                rows, error, _ = get_part1_forecast(chunk, days, first_index)
+                if error:
+                    yield json.dumps(error) + '\n'
+                    return
+                for record in forecast_records(rows):
+                    yield json.dumps(record) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    # Without streaming the whole grid is scored with one model call
+    rows, error, status_code = get_part1_forecast(stations, days)
+    if error:
+        return jsonify(error), status_code
+
+    return jsonify({'forecasts': list(forecast_records(rows))})
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages with the LLM model"""
@@ -515,6 +774,7 @@ def not_found(e):
         'available_endpoints': {
             '/': 'GET - Home page',
             '/predict': 'POST - Predict coral bleaching risk',
+            '/forecast': 'POST - Forecast coral bleaching risk for the next days',
             '/chat': 'POST - Chat with the AI assistant'
         }
     }), 404
@@ -0,0 +1,128 @@
+"""Build fingerprinted, precompressed copies of the frontend assets.
+
+Run from the repository root (or anywhere) with:
+
+    python app/backend/build_assets.py
+
+Output is written to app/frontend/dist/ together with a manifest.json that
+the backend uses to serve the hashed files with long-lived cache headers.
+Hashed files from earlier builds are kept so pages already loaded by a
+running server keep working; the manifest is replaced last and picked up by
+the backend without a restart.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always produced
+    brotli = None
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../frontend'))
+DIST_DIR = os.path.join(FRONTEND_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+# Assets referenced from index.html that get a content hash in their name
+ASSETS = ['css/styles.css', 'js/script.js']
+HASH_LENGTH = 12
+
+
+def content_hash(content):
+    """Return the short content hash used in fingerprinted file names"""
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(path, digest):
+    """Insert the content hash before the file extension (css/styles.css -> css/styles.<hash>.css)"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest}{ext}'
+
+
+def write_atomic(path, content):
+    """Write a file via a temporary file so a running server never reads it half-written"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as file:
+        file.write(content)
+    os.replace(f'{path}.tmp', path)
+
+
+def write_variants(path, content):
+    """Write the raw file plus its gzip (and brotli, if available) variants"""
+    write_atomic(path, content)
+
+    encodings = ['gzip']
+    # mtime=0 keeps the output byte-identical between builds
+    write_atomic(f'{path}.gz', gzip.compress(content, compresslevel=9, mtime=0))
+
+    if brotli is not None:
+        write_atomic(f'{path}.br', brotli.compress(content, quality=11))
+        encodings.insert(0, 'br')
+
+    return encodings
+
+
+def rewrite_references(html, assets):
+    """Point href/src attributes in index.html at the hashed asset names"""
+    def replace(match):
+        target = match.group(2)
+        if target in assets:
+            target = assets[target]['path']
+        return f'{match.group(1)}="{target}"'
+
+    return re.sub(r'\b(href|src)="([^"]+)"', replace, html)
+
+
+def load_previous_assets():
+    """Return the hashed assets listed by the current manifest, if any"""
+    manifest_path = os.path.join(DIST_DIR, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return []
+
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    return list(manifest['assets'].values()) + manifest.get('previous', [])
+
+
+def build():
+    """Build the dist directory and manifest"""
+    previous = load_previous_assets()
+
+    assets = {}
+    for asset in ASSETS:
+        with open(os.path.join(FRONTEND_DIR, asset), 'rb') as file:
+            content = file.read()
+
+        digest = content_hash(content)
+        path = hashed_name(asset, digest)
+        encodings = write_variants(os.path.join(DIST_DIR, path), content)
+        assets[asset] = {'path': path, 'hash': digest, 'encodings': encodings}
+        print(f'{asset} -> {path} ({", ".join(encodings)})')
+
+    # index.html keeps its name so it can be revalidated, only its references change
+    with open(os.path.join(FRONTEND_DIR, 'index.html'), 'r', encoding='utf-8') as file:
+        html = rewrite_references(file.read(), assets).encode('utf-8')
+    index = {
+        'path': 'index.html',
+        'hash': content_hash(html),
+        'encodings': write_variants(os.path.join(DIST_DIR, 'index.html'), html)
+    }
+    print(f'index.html -> index.html ({", ".join(index["encodings"])})')
+
+    # Older hashed files stay servable for pages that still reference them
+    current = {asset['path'] for asset in assets.values()}
+    previous = [asset for asset in previous if asset['path'] not in current]
+    previous = list({asset['path']: asset for asset in previous}.values())
+
+    # Written last: the backend reloads the manifest when it changes
+    manifest = {'index': index, 'assets': assets, 'previous': previous}
+    manifest = json.dumps(manifest, indent=2).encode('utf-8')
+    write_atomic(os.path.join(DIST_DIR, MANIFEST_NAME), manifest)
+
+    return assets
+
+
+if __name__ == '__main__':
+    build()